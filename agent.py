@@ -1,52 +1,93 @@
 # agent.py
 
 import asyncio
-import yaml
+import time
 import httpx
-import json
+import orjson
+from core.config import load_yaml
 from core.loop import AgentLoop
 from core.session import MultiMCP
 
-def log(stage: str, msg: str):
-    """Simple timestamped console logger."""
-    import datetime
-    now = datetime.datetime.now().strftime("%H:%M:%S")
-    print(f"[{now}] [{stage}] {msg}")
+# Local UTC offset, refreshed every 15 minutes: offsets and DST transitions always
+# fall on quarter-hour boundaries (e.g. America/St_Johns is UTC-3:30).
+_clock = {"slot": None, "offset": 0}
 
 
-async def get_telegram_query():
+def log(stage: str, msg: str):
+    """Simple timestamped console logger."""
+    t = int(time.time())
+    if t // 900 != _clock["slot"]:
+        _clock["slot"], _clock["offset"] = t // 900, time.localtime(t).tm_gmtoff
+    s = (t + _clock["offset"]) % 86400
+    print(f"[{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}] [{stage}] {msg}")
+
+
+async def _iter_sse_data(chunks):
+    """Yield the raw `data` payload of each SSE event from a byte stream.
+
+    Multi-line `data:` fields are joined with newlines and dispatched on the blank
+    line that ends the event, per the SSE spec; comments and other fields are skipped.
+    """
+    buffer = b""
+    data_lines = []
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line:
+                if data_lines:
+                    yield b"\n".join(data_lines)
+                    data_lines = []
+                continue
+            if line.startswith(b"data:"):
+                value = line[5:]
+                data_lines.append(value[1:] if value.startswith(b" ") else value)
+
+
+async def get_telegram_query(client: httpx.AsyncClient):
     """Listen to Telegram SSE stream and return the next user message."""
     print("🛰️ Waiting for Telegram message...")
-    async with httpx.AsyncClient(timeout=None) as client:
-        async with client.stream("GET", "http://127.0.0.1:8081/events") as stream:
-            async for line in stream.aiter_lines():
-                if not line:
-                    continue
-                if line.startswith("data:"):
-                    try:
-                        data = json.loads(line.replace("data:", "").strip())
-                        query = data.get("query", "").strip()
-                        if query:
-                            print(f"📩 Received Telegram message: {query}")
-                            return query
-                    except json.JSONDecodeError:
-                        print("⚠️ Invalid JSON from SSE stream, skipping.")
-                        continue
+    # The stream stays open until a message arrives, so it must not inherit the client timeout.
+    async with client.stream("GET", "http://127.0.0.1:8081/events", timeout=None) as stream:
+        async for payload in _iter_sse_data(stream.aiter_bytes()):
+            try:
+                data = orjson.loads(payload)
+            except orjson.JSONDecodeError:
+                print("⚠️ Invalid JSON from SSE stream, skipping.")
+                continue
+            query = data.get("query", "").strip()
+            if query:
+                print(f"📩 Received Telegram message: {query}")
+                return query
 
 
 async def main():
     print("🧠 Cortex-R Agent Ready")
 
+    # One pooled client for the SSE stream and HTTP MCP tools.
+    http_client = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+    try:
+        await run_agent(http_client)
+    finally:
+        await http_client.aclose()
+
+
+async def run_agent(http_client: httpx.AsyncClient):
     # Wait for Telegram-triggered query
-    user_input = await get_telegram_query()
+    user_input = await get_telegram_query(http_client)
 
     # Load MCP server configs
-    with open("config/profiles.yaml", "r") as f:
-        profile = yaml.safe_load(f)
-        mcp_servers = profile.get("mcp_servers", [])
+    profile = load_yaml("config/profiles.yaml")
+    mcp_servers = profile.get("mcp_servers", [])
 
     # Initialize and run agent
-    multi_mcp = MultiMCP(server_configs=mcp_servers)
+    multi_mcp = MultiMCP(server_configs=mcp_servers, http_client=http_client)
     print("Agent before initialize")
     await multi_mcp.initialize()
 
@@ -58,6 +99,8 @@ async def main():
     except Exception as e:
         log("fatal", f"Agent failed: {e}")
         raise
+    finally:
+        await multi_mcp.shutdown()
 
     print("✅ Agent completed run and exiting.")
 
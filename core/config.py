@@ -0,0 +1,66 @@
+# core/config.py
+
+import copy
+import hashlib
+import json
+import os
+from contextlib import suppress
+from functools import lru_cache
+from typing import Any
+
+import yaml
+
+# libyaml's C loader when PyYAML was built with it; the pure-Python loader otherwise.
+_SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@lru_cache(maxsize=16)
+def _load_yaml_cached(path: str, mtime_ns: int, size: int) -> Any:
+    """Parse `path` once per (mtime, size); prefer the sibling JSON cache when it matches."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    # The sidecar records a hash of the YAML it was built from, so restored files with
+    # older mtimes or edits within one mtime tick can never be served stale data.
+    json_path = path + ".json"
+    try:
+        with open(json_path, "rb") as f:
+            cached = json.loads(f.read())
+        if cached.get("sha256") == digest:
+            return cached["data"]
+    except (OSError, ValueError, AttributeError, KeyError):
+        pass  # missing, unreadable or foreign cache; fall back to YAML
+
+    data = yaml.load(raw, Loader=_SafeLoader)
+
+    # Persist a JSON copy so later processes can skip YAML parsing, but only when JSON
+    # reproduces the data exactly (non-str keys like `1: x` would come back as "1").
+    try:
+        encoded = json.dumps({"sha256": digest, "data": data})
+        if json.loads(encoded)["data"] != data:
+            return data
+    except (TypeError, ValueError):
+        return data  # values JSON can't represent (e.g. dates)
+
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(encoded)
+        os.replace(tmp_path, json_path)
+    except OSError:
+        # Read-only config dir; the in-process cache still applies.
+        with suppress(OSError):
+            os.remove(tmp_path)
+
+    return data
+
+
+def load_yaml(path: str | os.PathLike) -> Any:
+    """Load a YAML config file, reparsing only when its mtime or size changes.
+
+    Returns a deep copy so callers can mutate the result without touching the cache.
+    """
+    path = os.fspath(path)
+    st = os.stat(path)
+    return copy.deepcopy(_load_yaml_cached(path, st.st_mtime_ns, st.st_size))
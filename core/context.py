@@ -24,14 +24,16 @@
 from typing import List, Optional, Dict, Any
 from modules.memory import MemoryManager, MemoryItem
 from pathlib import Path
-import yaml
+from core.config import load_yaml
 import time
 import uuid
 
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
 class AgentProfile:
-    def __init__(self, config_path: str = "config/profiles.yaml"):
-        with open(config_path, "r") as f:
-            config = yaml.safe_load(f)
+    def __init__(self, config_path: str | Path = PROFILE_YAML):
+        config = load_yaml(config_path)
 
         self.name = config["agent"]["name"]
         self.id = config["agent"]["id"]
@@ -70,9 +72,9 @@ class AgentContext:
         trace = ToolCallTrace(name, args, result)
         self.tool_calls.append(trace)
 
-    def add_memory(self, item: MemoryItem):
+    async def add_memory(self, item: MemoryItem):
         self.memory_trace.append(item)
-        self.memory.add(item)
+        await self.memory.add_async(item)
 
     def __repr__(self):
         return f"<AgentContext step={self.step}, session_id={self.session_id}>"
@@ -0,0 +1,66 @@
+# core/google_auth.py
+
+import asyncio
+import logging
+import time
+from urllib.parse import urlencode
+
+import httpx
+import orjson
+from fastapi import HTTPException, status
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+TOKEN_EXPIRY_MARGIN = 60.0  # refresh this many seconds before Google's expiry
+
+logger = logging.getLogger("google_auth")
+
+
+class GoogleTokenCache:
+    """OAuth access token for a refresh-token grant, refreshed shortly before it expires.
+
+    Concurrent callers that find the token stale share a single refresh request.
+    """
+
+    def __init__(self, client_id: str | None, client_secret: str | None, refresh_token: str | None):
+        # The grant never changes for the process lifetime, so encode it once. Unset
+        # credentials encode as empty values, matching what httpx did for `data=` with None.
+        self._body = urlencode(
+            {
+                "client_id": client_id or "",
+                "client_secret": client_secret or "",
+                "refresh_token": refresh_token or "",
+                "grant_type": "refresh_token",
+            }
+        ).encode("ascii")
+        self._headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        self._token: str | None = None
+        self._exp = 0.0  # time.monotonic() deadline
+        self._refresh: asyncio.Task | None = None
+
+    async def get(self, client: httpx.AsyncClient) -> str:
+        if time.monotonic() < self._exp - TOKEN_EXPIRY_MARGIN:
+            return self._token
+
+        if self._refresh is None:
+            # The refresh runs in its own task, so no caller's cancellation reaches it.
+            self._refresh = asyncio.ensure_future(self._fetch(client))
+            self._refresh.add_done_callback(self._refresh_done)
+        return await asyncio.shield(self._refresh)
+
+    def _refresh_done(self, task: asyncio.Task) -> None:
+        self._refresh = None
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller was cancelled
+
+    async def _fetch(self, client: httpx.AsyncClient) -> str:
+        resp = await client.post(GOOGLE_TOKEN_URL, content=self._body, headers=self._headers)
+        if resp.status_code != 200:
+            logger.error("Failed to get access token: %s", resp.text)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=f"Google OAuth error: {resp.text}",
+            )
+        token_data = orjson.loads(resp.content)
+        self._token = token_data["access_token"]
+        self._exp = time.monotonic() + float(token_data.get("expires_in", 3600))
+        return self._token
@@ -82,7 +82,7 @@ class AgentLoop:
                 print(f"[perception] Intent: {perception.intent}, Hint: {perception.tool_hint}")
 
                 # 💾 Memory Retrieval
-                retrieved = self.context.memory.retrieve(
+                retrieved = await self.context.memory.retrieve_async(
                     query=query,
                     top_k=self.context.agent_profile.memory_config["top_k"],
                     type_filter=self.context.agent_profile.memory_config.get("type_filter", None),
@@ -111,35 +111,49 @@ class AgentLoop:
 
                 # ⚙️ Tool Execution
                 try:
-                    tool_name, arguments = parse_function_call(plan)
-
-                    if self.tool_expects_input(tool_name):
-                        tool_input = {'input': arguments} if not (isinstance(arguments, dict) and 'input' in arguments) else arguments
-                    else:
-                        tool_input = arguments
-
-                    response = await self.mcp.call_tool(tool_name, tool_input)
-
-                    # ✅ Safe TextContent parsing
-                    raw = getattr(response.content, 'text', str(response.content))
-                    try:
-                        result_obj = json.loads(raw) if raw.strip().startswith("{") else raw
-                    except json.JSONDecodeError:
-                        result_obj = raw
-
-                    result_str = result_obj.get("markdown") if isinstance(result_obj, dict) else str(result_obj)
-                    print(f"[action] {tool_name} → {result_str}")
-
-                    # 🧠 Add memory
-                    memory_item = MemoryItem(
-                        text=f"{tool_name}({arguments}) → {result_str}",
-                        type="tool_output",
-                        tool_name=tool_name,
-                        user_query=query,
-                        tags=[tool_name],
-                        session_id=self.context.session_id
-                    )
-                    self.context.add_memory(memory_item)
+                    # Independent FUNCTION_CALL lines in one plan are dispatched together.
+                    parsed_calls = [parse_function_call(line.strip()) for line in plan.splitlines() if line.strip()]
+
+                    calls = []
+                    for tool_name, arguments in parsed_calls:
+                        if self.tool_expects_input(tool_name):
+                            tool_input = {'input': arguments} if not (isinstance(arguments, dict) and 'input' in arguments) else arguments
+                        else:
+                            tool_input = arguments
+                        calls.append((tool_name, tool_input))
+
+                    responses = await self.mcp.call_tools(calls)
+
+                    results = []
+                    for (tool_name, arguments), response in zip(parsed_calls, responses):
+                        if isinstance(response, BaseException):
+                            # One failed call doesn't discard the others; the error goes to memory too.
+                            result_str = f"ERROR: {response}"
+                            print(f"[error] Tool {tool_name} failed: {response}")
+                        else:
+                            # ✅ Safe TextContent parsing
+                            raw = getattr(response.content, 'text', str(response.content))
+                            try:
+                                result_obj = json.loads(raw) if raw.strip().startswith("{") else raw
+                            except json.JSONDecodeError:
+                                result_obj = raw
+
+                            result_str = result_obj.get("markdown") if isinstance(result_obj, dict) else str(result_obj)
+                            print(f"[action] {tool_name} → {result_str}")
+                        results.append(f"{tool_name}: {result_str}" if len(parsed_calls) > 1 else result_str)
+
+                        # 🧠 Add memory
+                        memory_item = MemoryItem(
+                            text=f"{tool_name}({arguments}) → {result_str}",
+                            type="tool_output",
+                            tool_name=tool_name,
+                            user_query=query,
+                            tags=[tool_name, "error"] if isinstance(response, BaseException) else [tool_name],
+                            session_id=self.context.session_id
+                        )
+                        await self.context.add_memory(memory_item)
+
+                    result_str = "\n\n".join(results)
 
                     # 🔁 Next query
                     query = f"""Original user task: {self.context.user_input}
@@ -1,19 +1,63 @@
 # core/session.py
 
+import asyncio
 import os
 import sys
-from typing import Optional, Any, List, Dict
+from datetime import timedelta
+from functools import partial
+from typing import Optional, Any, List, Dict, Tuple
 from types import SimpleNamespace
 
+import anyio
 import httpx
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+
+MAX_CONCURRENT_STARTS = 8  # cap on stdio servers spawned at once during initialize()
+# Per-request limit on a stdio session. A server that died mid-call never answers,
+# so without it the call (and its admission slot) would wait forever.
+STDIO_REQUEST_TIMEOUT = timedelta(seconds=60)
+# Spawn-to-list_tools limit for one stdio server. A script that exits before the
+# handshake leaves initialize() waiting, so this bounds how long it can hold up the rest.
+STDIO_START_TIMEOUT = 30  # seconds
+# Raised by a session whose server has exited: the request was never sent.
+_SESSION_CLOSED = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+async def _run_stdio_session(
+    params: StdioServerParameters, ready: asyncio.Future, closing: asyncio.Event
+) -> None:
+    """Own one stdio session from spawn to shutdown.
+
+    stdio_client runs an anyio task group whose cancel scope must be exited by the task
+    that entered it, so a dedicated task holds the contexts open until `closing` is set.
+    """
+    try:
+        async with stdio_client(params) as (read, write):
+            print("Connection established, creating session...")
+            async with ClientSession(
+                read, write, read_timeout_seconds=STDIO_REQUEST_TIMEOUT
+            ) as session:
+                print("[agent] Session created, initializing...")
+                await session.initialize()
+                print("[agent] MCP session initialized")
+                ready.set_result((session, await session.list_tools()))
+                await closing.wait()
+    except Exception as e:
+        if not ready.done():
+            ready.set_exception(e)
+        else:
+            print(f"⚠️ MCP server {params.args[0]} exited with error: {e}")
+    finally:
+        if not ready.done():
+            ready.cancel()
 
 
 class MCP:
     """
-    Lightweight wrapper for one-time MCP tool calls using stdio transport.
-    Each call spins up a new subprocess and terminates cleanly.
+    Lightweight wrapper for MCP tool calls using stdio transport.
+    The server subprocess is spawned on first use and kept alive until shutdown().
     """
 
     def __init__(
@@ -25,53 +69,135 @@ class MCP:
         self.server_script = server_script
         self.working_dir = working_dir or os.getcwd()
         self.server_command = server_command or sys.executable
+        self._task: Optional[asyncio.Task] = None  # owns the stdio session; see _run_stdio_session
+        self._session: Optional[ClientSession] = None
+        self._closing = asyncio.Event()
+        self._lock = asyncio.Lock()  # one spawn even when several first calls race
+
+    async def connect(self) -> ClientSession:
+        async with self._lock:
+            if self._session is not None:
+                return self._session
+
+            server_params = StdioServerParameters(
+                command=self.server_command,
+                args=[self.server_script],
+                cwd=self.working_dir
+            )
+            closing = asyncio.Event()
+            ready = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(_run_stdio_session(server_params, ready, closing))
+            try:
+                session, _ = await ready
+            except BaseException:
+                closing.set()  # release the session task if it got that far
+                if ready.cancelled() and not asyncio.current_task().cancelling():
+                    raise RuntimeError(
+                        f"MCP server {self.server_script} exited before its session was ready"
+                    ) from None
+                raise
+
+            self._task, self._closing, self._session = task, closing, session
+            return session
+
+    async def disconnect(self):
+        await self.shutdown()
 
     async def list_tools(self):
-        server_params = StdioServerParameters(
-            command=self.server_command,
-            args=[self.server_script],
-            cwd=self.working_dir
-        )
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                tools_result = await session.list_tools()
-                return tools_result.tools
+        session = await self.connect()
+        tools_result = await session.list_tools()
+        return tools_result.tools
 
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
-        server_params = StdioServerParameters(
-            command=self.server_command,
-            args=[self.server_script],
-            cwd=self.working_dir
-        )
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                return await session.call_tool(tool_name, arguments=arguments)
+        session = await self.connect()
+        try:
+            return await session.call_tool(tool_name, arguments=arguments)
+        except _SESSION_CLOSED:
+            # The server exited since the last call; respawn it once.
+            await self._reset(session)
+            session = await self.connect()
+            return await session.call_tool(tool_name, arguments=arguments)
+
+    async def _reset(self, session: ClientSession):
+        """Close `session` unless a concurrent caller already replaced it."""
+        async with self._lock:
+            if self._session is session:
+                await self._close_locked()
+
+    async def shutdown(self):
+        async with self._lock:
+            await self._close_locked()
+
+    async def _close_locked(self):
+        task, self._task, self._session = self._task, None, None
+        if task is not None:
+            self._closing.set()
+            await asyncio.gather(task, return_exceptions=True)
 
 
 class MultiMCP:
     """
-    Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
-    Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Discovers tools from multiple MCP servers and keeps one stdio session open per script.
+    Each call_tool() reuses the session registered for the tool's server, respawning the server
+    if its session has died; call shutdown() to close them.
     """
 
-    def __init__(self, server_configs: List[dict]):
+    def __init__(
+        self,
+        server_configs: List[dict],
+        max_inflight: int = 8,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
         self.server_configs = server_configs
-        self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
+        self.max_inflight = max_inflight  # default per-server cap on concurrent calls
+        self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool, call, server}
+        self._session_tasks: Dict[str, asyncio.Task] = {}  # script → task holding its stdio session open
+        self._sessions: Dict[str, ClientSession] = {}  # script → initialized session
+        self._stdio_configs: Dict[str, dict] = {}  # script → config, to respawn a dead server
+        self._restart_locks: Dict[str, asyncio.Lock] = {}  # one respawn per script at a time
+        self._closing = asyncio.Event()  # set by shutdown() to release the session tasks
+        # Per-server admission control, keyed by script/host: calls in flight, their cap,
+        # and the condition waiters block on until a slot frees up or the cap grows.
+        self._inflight: Dict[str, int] = {}
+        self._cmax: Dict[str, int] = {}
+        self._cond: Dict[str, asyncio.Condition] = {}
+        self._http = http_client  # shared client for HTTP tools; created on first use if not given
+        self._owns_http = http_client is None
+
+    async def connect(self):
+        await self.initialize()
+
+    async def disconnect(self):
+        await self.shutdown()
 
     async def initialize(self):
         print("in MultiMCP initialize")
-        for config in self.server_configs:
+        # Stdio servers are spawned concurrently, but their tools are registered in config
+        # order afterwards so name clashes resolve the same way as a sequential scan.
+        limit = asyncio.Semaphore(MAX_CONCURRENT_STARTS)
+
+        async def start(config: Dict[str, Any]) -> Optional[List[Any]]:
+            async with limit:
+                return await self._start_stdio_server(config)
+
+        started: Dict[int, asyncio.Task] = {}
+        async with asyncio.TaskGroup() as tg:
+            for i, config in enumerate(self.server_configs):
+                if "script" in config:
+                    started[i] = tg.create_task(start(config))
+
+        for i, config in enumerate(self.server_configs):
             if "script" in config:
-                await self._register_stdio_server(config)
+                tools = started[i].result()
+                if tools is not None:
+                    self._register_stdio_server(config, tools)
             elif "host" in config:
                 self._register_http_server(config)
             else:
                 print(f"⚠️ Skipping server config lacking 'script' or 'host': {config}")
 
-    async def _register_stdio_server(self, config: Dict[str, Any]) -> None:
-        """Discover tools from a traditional stdio-based MCP server."""
+    async def _start_stdio_server(self, config: Dict[str, Any]) -> Optional[List[Any]]:
+        """Spawn a traditional stdio-based MCP server and return its tools (None on failure)."""
         try:
             params = StdioServerParameters(
                 command=sys.executable,
@@ -79,27 +205,101 @@ class MultiMCP:
                 cwd=config.get("cwd", os.getcwd())
             )
             print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
-            async with stdio_client(params) as (read, write):
-                print("Connection established, creating session...")
-                try:
-                    async with ClientSession(read, write) as session:
-                        print("[agent] Session created, initializing...")
-                        await session.initialize()
-                        print("[agent] MCP session initialized")
-                        tools = await session.list_tools()
-                        tool_names = [tool.name for tool in tools.tools]
-                        print(f"→ Tools received: {tool_names}")
-                        for tool in tools.tools:
-                            self.tool_map[tool.name] = {
-                                "config": {**config, "transport": "stdio"},
-                                "tool": tool,
-                                "transport": "stdio",
-                            }
-                except Exception as se:
-                    print(f"❌ Session error: {se}")
+            ready = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(_run_stdio_session(params, ready, self._closing))
+            try:
+                async with asyncio.timeout(STDIO_START_TIMEOUT):
+                    session, tools = await ready
+            except TimeoutError:
+                print(f"❌ Session error: {config['script']} did not initialize within {STDIO_START_TIMEOUT}s")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+            except asyncio.CancelledError:
+                if not ready.cancelled() or asyncio.current_task().cancelling():
+                    task.cancel()
+                    raise
+                # The session task exited without reporting ready (e.g. the server
+                # closed its pipes); that is a failed start, not a cancellation.
+                print(f"❌ Session error: {config['script']} exited before initializing")
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+            except Exception as se:
+                print(f"❌ Session error: {se}")
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+
+            self._session_tasks[config["script"]] = task
+            self._sessions[config["script"]] = session
+            task.add_done_callback(partial(self._on_session_exit, config["script"]))
+            return tools.tools
         except Exception as e:
             script_name = config.get("script", "<unknown>")
             print(f"❌ Error initializing MCP server {script_name}: {e}")
+            return None
+
+    def _register_stdio_server(self, config: Dict[str, Any], tools: List[Any]) -> None:
+        """Register the tools discovered on a started stdio server."""
+        script = config["script"]
+        self._stdio_configs[script] = config
+        self._register_admission(script, config)
+        tool_names = [tool.name for tool in tools]
+        print(f"→ Tools received: {tool_names}")
+        for tool in tools:
+            self.tool_map[tool.name] = {
+                "config": {**config, "transport": "stdio"},
+                "tool": tool,
+                "transport": "stdio",
+                "call": partial(self._call_stdio, script, tool.name),
+                "server": script,
+            }
+
+    def _on_session_exit(self, script: str, task: asyncio.Task) -> None:
+        """Forget a session whose task ended, so the next call respawns the server."""
+        if self._session_tasks.get(script) is task:
+            del self._session_tasks[script]
+            self._sessions.pop(script, None)
+
+    def _drop_session(self, script: str, session: ClientSession) -> None:
+        """Discard a broken session unless it has already been replaced."""
+        if self._sessions.get(script) is session:
+            del self._sessions[script]
+            task = self._session_tasks.pop(script, None)
+            if task is not None:
+                task.cancel()
+
+    async def _live_session(self, script: str) -> ClientSession:
+        session = self._sessions.get(script)
+        if session is not None:
+            return session
+        async with self._restart_locks.setdefault(script, asyncio.Lock()):
+            session = self._sessions.get(script)
+            if session is None:
+                print(f"🔄 Restarting MCP server {script}")
+                if await self._start_stdio_server(self._stdio_configs[script]) is None:
+                    raise RuntimeError(f"MCP server {script} is unavailable")
+                session = self._sessions[script]
+        return session
+
+    async def _call_stdio(self, script: str, tool_name: str, arguments: dict) -> Any:
+        """Call a tool on the script's persistent session, respawning the server if it died."""
+        session = await self._live_session(script)
+        try:
+            return await session.call_tool(tool_name, arguments)
+        except _SESSION_CLOSED:
+            # The request never reached the dead server, so retrying can't run it twice.
+            self._drop_session(script, session)
+            session = await self._live_session(script)
+            return await session.call_tool(tool_name, arguments)
+        except McpError as exc:
+            if exc.error.code != httpx.codes.REQUEST_TIMEOUT:
+                raise
+            # No answer in time usually means the server is gone; respawn on the next call.
+            self._drop_session(script, session)
+            raise RuntimeError(
+                f"MCP server {script} did not answer '{tool_name}' within "
+                f"{STDIO_REQUEST_TIMEOUT.total_seconds():.0f}s"
+            ) from exc
 
     def _register_http_server(self, config: Dict[str, Any]) -> None:
         """Register statically defined HTTP tools from REST-style services."""
@@ -108,6 +308,9 @@ class MultiMCP:
             print(f"⚠️ HTTP server {config.get('name', config.get('host'))} has no tools defined; skipping.")
             return
 
+        host = config["host"].rstrip("/")
+        self._register_admission(config["host"], config)
+        client = self._http_client()
         registered = []
         for tool_def in tools:
             tool_name = tool_def.get("name")
@@ -121,12 +324,17 @@ class MultiMCP:
                 description=tool_def.get("description") or config.get("description", ""),
                 parameters=tool_def.get("parameters") or {},
             )
+            method = (tool_def.get("method") or "POST").upper()
+            url = host + endpoint
             self.tool_map[tool_name] = {
                 "config": {**config, "transport": "http"},
                 "tool": tool_obj,
                 "transport": "http",
                 "endpoint": endpoint,
-                "method": (tool_def.get("method") or "POST").upper(),
+                "method": method,
+                "url": url,
+                "call": self._build_http_call(client, tool_name, url, method),
+                "server": config["host"],
             }
             registered.append(tool_name)
 
@@ -135,48 +343,80 @@ class MultiMCP:
                 f"→ Registered HTTP tools from {config.get('name', config.get('host'))}: {registered}"
             )
 
-    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
-        entry = self.tool_map.get(tool_name)
-        if not entry:
-            raise ValueError(f"Tool '{tool_name}' not found on any server.")
+    def _register_admission(self, server: str, config: Dict[str, Any]) -> None:
+        """Set up the in-flight call limit shared by every tool of one server (script or host)."""
+        if server not in self._cond:
+            self._inflight[server] = 0
+            self._cmax[server] = config.get("max_inflight", self.max_inflight)
+            self._cond[server] = asyncio.Condition()
 
-        config = entry["config"]
-        transport = entry.get("transport", "stdio")
+    async def set_max_inflight(self, server: str, limit: int) -> None:
+        """Resize a server's concurrent-call cap at runtime; waiters re-check immediately."""
+        cond = self._cond[server]
+        async with cond:
+            self._cmax[server] = limit
+            cond.notify_all()
 
-        if transport == "stdio":
-            params = StdioServerParameters(
-                command=sys.executable,
-                args=[config["script"]],
-                cwd=config.get("cwd", os.getcwd())
-            )
+    async def _release(self, server: str) -> None:
+        cond = self._cond[server]
+        async with cond:
+            self._inflight[server] -= 1
+            cond.notify(1)
 
-            async with stdio_client(params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-                    return await session.call_tool(tool_name, arguments)
+    def _http_client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                http2=True,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._http
 
-        if transport == "http":
-            host = config.get("host")
-            endpoint = entry.get("endpoint")
-            method = entry.get("method", "POST").upper()
-            if not host or not endpoint:
-                raise ValueError(f"HTTP tool '{tool_name}' lacks host or endpoint configuration.")
+    @staticmethod
+    def _build_http_call(client: httpx.AsyncClient, tool_name: str, url: str, method: str):
+        """Bind URL and verb once so call_tool doesn't rebuild them per call."""
+        if method == "GET":
+            send = lambda args: client.get(url, params=args)
+        else:
+            send = lambda args: client.post(url, json=args)
 
-            url = host.rstrip("/") + endpoint
+        async def call(arguments: dict) -> Any:
             try:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    if method == "GET":
-                        response = await client.get(url, params=arguments)
-                    else:
-                        response = await client.post(url, json=arguments)
-                    response.raise_for_status()
+                response = await send(arguments)
+                response.raise_for_status()
             except httpx.HTTPError as exc:
                 raise RuntimeError(f"HTTP tool '{tool_name}' request failed: {exc}") from exc
 
             # Normalize to mimic MCP TextContent responses.
             return SimpleNamespace(content=SimpleNamespace(text=response.text))
 
-        raise ValueError(f"Unsupported transport '{transport}' for tool '{tool_name}'.")
+        return call
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        entry = self.tool_map.get(tool_name)
+        if not entry:
+            raise ValueError(f"Tool '{tool_name}' not found on any server.")
+
+        server = entry["server"]
+        cond = self._cond[server]
+        async with cond:
+            await cond.wait_for(lambda: self._inflight[server] < self._cmax[server])
+            self._inflight[server] += 1
+        try:
+            return await entry["call"](arguments)
+        finally:
+            # Shielded so a cancelled call still gives its slot back.
+            await asyncio.shield(self._release(server))
+
+    async def call_tools(self, calls: List[Tuple[str, dict]]) -> List[Any]:
+        """Run independent tool calls concurrently; results come back in call order.
+
+        A failed call yields its exception in place of a result, so the other calls'
+        results (and side effects) are never lost.
+        """
+        return await asyncio.gather(
+            *(self.call_tool(name, args) for name, args in calls), return_exceptions=True
+        )
 
     async def list_all_tools(self) -> List[str]:
         return list(self.tool_map.keys())
@@ -185,4 +425,14 @@ class MultiMCP:
         return [entry["tool"] for entry in self.tool_map.values()]
 
     async def shutdown(self):
-        pass  # no persistent sessions to close
+        # Each session task closes its own contexts once released.
+        self._closing.set()
+        tasks = list(self._session_tasks.values())
+        self._session_tasks.clear()
+        self._sessions.clear()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._closing = asyncio.Event()
+
+        if self._owns_http and self._http is not None:
+            await self._http.aclose()
+            self._http = None
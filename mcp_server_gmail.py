@@ -1,22 +1,24 @@
 import base64
-import json
 import logging
 import os
 from email.message import EmailMessage
 from typing import Any, Dict
 
 import httpx
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+
+from core.google_auth import GoogleTokenCache
 
 load_dotenv()
 
 logger = logging.getLogger("gmail_mcp_server")
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Gmail MCP Server", version="2.0")
+app = FastAPI(title="Gmail MCP Server", version="2.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,37 +36,60 @@ GOOGLE_REFRESH_TOKEN = os.getenv("GOOGLE_REFRESH_TOKEN")
 GMAIL_SEND_URL = "https://gmail.googleapis.com/gmail/v1/users/me/messages/send"
 
 
-# 🔁 Function to get a fresh access token each time
-async def get_access_token() -> str:
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "refresh_token": GOOGLE_REFRESH_TOKEN,
-                "grant_type": "refresh_token",
-            },
-        )
-        if resp.status_code != 200:
-            logger.error("Failed to get access token: %s", resp.text)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Google OAuth error: {resp.text}",
-            )
-        return resp.json()["access_token"]
+# Cached OAuth access token, shared by every request handler.
+_google_token = GoogleTokenCache(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN)
 
 
-# 📧 Send an email using Gmail API
-async def send_email_via_gmail(to: str, subject: str, body: str) -> Dict[str, Any]:
-    access_token = await get_access_token()
+@app.on_event("startup")
+async def startup_event() -> None:
+    # One pooled client for OAuth and API calls, so TLS/TCP connections are reused.
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await app.state.http.aclose()
+
+
+# 🔁 Function to get an access token, refreshing it shortly before it expires
+async def get_access_token() -> str:
+    return await _google_token.get(app.state.http)
+
+
+# ✉️ Build the RFC 5322 message bytes
+def build_raw_message(to: str, subject: str, body: str) -> bytes:
+    # Fast path: plain ASCII with single-line headers and short body lines needs no
+    # charset detection, encoding or header folding, so assemble the bytes directly.
+    if to.isascii() and subject.isascii() and body.isascii() and not any(c in to + subject for c in "\r\n"):
+        headers = [
+            f"To: {to}",
+            f"Subject: {subject}",
+            "MIME-Version: 1.0",
+            "Content-Type: text/plain; charset=us-ascii",
+            "Content-Transfer-Encoding: 7bit",
+        ]
+        lines = body.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        if all(len(line) <= 998 for line in headers + lines):
+            if lines[-1]:
+                lines.append("")  # end the body with a line break, as set_content does
+            return "\r\n".join(headers + [""] + lines).encode("ascii")
 
     message = EmailMessage()
     message["To"] = to
     message["Subject"] = subject
     message.set_content(body)
+    return message.as_bytes()
+
+
+# 📧 Send an email using Gmail API
+async def send_email_via_gmail(to: str, subject: str, body: str) -> Dict[str, Any]:
+    access_token = await get_access_token()
 
-    raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
+    raw_message = base64.urlsafe_b64encode(build_raw_message(to, subject, body)).decode("utf-8")
     payload = {"raw": raw_message}
 
     headers = {
@@ -72,26 +97,26 @@ async def send_email_via_gmail(to: str, subject: str, body: str) -> Dict[str, An
         "Content-Type": "application/json",
     }
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(GMAIL_SEND_URL, json=payload, headers=headers)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            logger.error("Gmail API error %s: %s", exc.response.status_code, exc.response.text)
-            raise HTTPException(status_code=500, detail=f"Gmail API error: {exc.response.text}")
-        except httpx.RequestError as exc:
-            logger.error("Network error when contacting Gmail API: %s", exc)
-            raise HTTPException(status_code=500, detail="Network error contacting Gmail API") from exc
-
-    result = response.json()
+    client = app.state.http
+    try:
+        response = await client.post(GMAIL_SEND_URL, json=payload, headers=headers)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        logger.error("Gmail API error %s: %s", exc.response.status_code, exc.response.text)
+        raise HTTPException(status_code=500, detail=f"Gmail API error: {exc.response.text}")
+    except httpx.RequestError as exc:
+        logger.error("Network error when contacting Gmail API: %s", exc)
+        raise HTTPException(status_code=500, detail="Network error contacting Gmail API") from exc
+
+    result = orjson.loads(response.content)
     logger.info("📨 Email sent successfully to %s", to)
     return result
 
 
 # 🚀 Endpoint to send an email
 @app.post("/send_email")
-async def send_email_endpoint(request: Request) -> JSONResponse:
-    data = await request.json()
+async def send_email_endpoint(request: Request) -> ORJSONResponse:
+    data = orjson.loads(await request.body())
 
     to = data.get("to")
     subject = data.get("subject")
@@ -103,7 +128,7 @@ async def send_email_endpoint(request: Request) -> JSONResponse:
     result = await send_email_via_gmail(to, subject, body)
     message_id = result.get("id", "unknown")
 
-    return JSONResponse({"ok": True, "id": message_id})
+    return ORJSONResponse({"ok": True, "id": message_id})
 
 
 # 🩺 Health check
@@ -113,5 +138,15 @@ async def health() -> Dict[str, str]:
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run("mcp_server_gmail:app", host="127.0.0.1", port=8082, log_level="info")
+
+    # uvloop has no Windows build; fall back to the stdlib loop there.
+    uvicorn.run(
+        "mcp_server_gmail:app",
+        host="127.0.0.1",
+        port=8082,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level="info",
+    )
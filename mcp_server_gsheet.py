@@ -1,21 +1,24 @@
-import json
 import logging
 import os
+from functools import lru_cache
 from typing import Any, Dict, List
 from urllib.parse import quote
 
 import httpx
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request, status
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+
+from core.google_auth import GoogleTokenCache
 
 load_dotenv()
 
 logger = logging.getLogger("gsheet_mcp_server")
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Google Sheets MCP Server", version="2.0")
+app = FastAPI(title="Google Sheets MCP Server", version="2.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,25 +36,28 @@ GOOGLE_REFRESH_TOKEN = os.getenv("GOOGLE_REFRESH_TOKEN")
 SHEETS_BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
 
 
-# 🔐 Function: Exchange refresh token for a fresh access token
+# Cached OAuth access token, shared by every request handler.
+_google_token = GoogleTokenCache(GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN)
+
+
+@app.on_event("startup")
+async def startup_event() -> None:
+    # One pooled client for OAuth and API calls, so TLS/TCP connections are reused.
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await app.state.http.aclose()
+
+
+# 🔐 Function: Exchange refresh token for an access token (cached until near expiry)
 async def get_access_token() -> str:
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(
-            "https://oauth2.googleapis.com/token",
-            data={
-                "client_id": GOOGLE_CLIENT_ID,
-                "client_secret": GOOGLE_CLIENT_SECRET,
-                "refresh_token": GOOGLE_REFRESH_TOKEN,
-                "grant_type": "refresh_token",
-            },
-        )
-        if resp.status_code != 200:
-            logger.error("Failed to get access token: %s", resp.text)
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=f"Google OAuth error: {resp.text}",
-            )
-        return resp.json()["access_token"]
+    return await _google_token.get(app.state.http)
 
 
 # 🔧 Build dynamic headers
@@ -68,15 +74,15 @@ async def create_google_sheet(title: str) -> Dict[str, Any]:
     headers = await build_headers()
     payload = {"properties": {"title": title}}
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.post(SHEETS_BASE_URL, json=payload, headers=headers)
-            response.raise_for_status()
-        except Exception as exc:
-            logger.exception("Error creating Google Sheet: %s", exc)
-            raise HTTPException(status_code=500, detail="Failed to create Google Sheet")
+    client = app.state.http
+    try:
+        response = await client.post(SHEETS_BASE_URL, json=payload, headers=headers)
+        response.raise_for_status()
+    except Exception as exc:
+        logger.exception("Error creating Google Sheet: %s", exc)
+        raise HTTPException(status_code=500, detail="Failed to create Google Sheet")
 
-    result = response.json()
+    result = orjson.loads(response.content)
     logger.info("✅ Created Google Sheet: %s", result)
     return {
         "spreadsheetId": result["spreadsheetId"],
@@ -84,12 +90,18 @@ async def create_google_sheet(title: str) -> Dict[str, Any]:
     }
 
 
+# 🔤 Percent-encode an A1 range; agents reuse a handful of ranges, so cache the result
+@lru_cache(maxsize=1024)
+def encode_range(range_: str) -> str:
+    return quote(range_, safe="!$'()*+,-./@_~")
+
+
 # ✏️ Write data into Google Sheet
 async def write_to_google_sheet(sheet_id: str, range_: str, values: List[List[str]]) -> Dict[str, Any]:
     headers = await build_headers()
 
     # ✅ Encode the range so `:` inside of A1:B2 doesn't conflict with the `:update` suffix
-    encoded_range = quote(range_, safe="!$'()*+,-./@_~")
+    encoded_range = encode_range(range_)
 
     # ✅ Build url without the stale ':update' suffix (Sheets API expects plain PUT on /values/{range})
     url = f"{SHEETS_BASE_URL}/{sheet_id}/values/{encoded_range}"
@@ -103,28 +115,69 @@ async def write_to_google_sheet(sheet_id: str, range_: str, values: List[List[st
         "values": values
     }
 
-    logger.info(f"📊 PUT {url}?valueInputOption=RAW")
-    logger.info(f"📤 Payload: {json.dumps(payload, indent=2)}")
+    logger.info("📊 PUT %s?valueInputOption=RAW (%d rows into %s)", url, len(values), range_)
+    # Only serialize the full payload when DEBUG is actually on; large writes are MBs of JSON.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📤 Payload: %s", orjson.dumps(payload).decode())
+
+    client = app.state.http
+    try:
+        response = await client.put(url, headers=headers, params=params, json=payload)
+        text = response.text
+        if response.status_code != 200:
+            logger.error("❌ Google Sheets API error (%s): %s", response.status_code, text)
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Google Sheets API error: {text}",
+            )
+        logger.info("✅ Successfully updated range: %s", range_)
+        return orjson.loads(response.content)
+
+    except httpx.RequestError as e:
+        logger.exception("🔌 Connection error writing to Google Sheets: %s", e)
+        raise HTTPException(status_code=500, detail=f"Network error: {e}")
+    except Exception as exc:
+        logger.exception("💥 Unexpected error writing to Google Sheet")
+        raise HTTPException(status_code=500, detail=f"Internal error: {exc}")
+
+
+# 🧮 Write several ranges in one request via values:batchUpdate
+async def batch_write_to_google_sheet(sheet_id: str, updates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    headers = await build_headers()
+
+    url = f"{SHEETS_BASE_URL}/{sheet_id}/values:batchUpdate"
+    payload = {
+        "valueInputOption": "RAW",
+        "data": [
+            {"range": update["range"], "majorDimension": "ROWS", "values": update["values"]}
+            for update in updates
+        ],
+    }
+
+    logger.info("📊 POST %s (%d ranges)", url, len(updates))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📤 Payload: %s", orjson.dumps(payload).decode())
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.put(url, headers=headers, params=params, json=payload)
-            text = response.text
-            if response.status_code != 200:
-                logger.error(f"❌ Google Sheets API error ({response.status_code}): {text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Google Sheets API error: {text}",
-                )
-            logger.info(f"✅ Successfully updated range: {range_}")
-            return response.json()
+    client = app.state.http
+    try:
+        response = await client.post(url, headers=headers, json=payload)
+        if response.status_code != 200:
+            logger.error("❌ Google Sheets API error (%s): %s", response.status_code, response.text)
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Google Sheets API error: {response.text}",
+            )
+        logger.info("✅ Successfully updated %d ranges", len(updates))
+        return orjson.loads(response.content)
 
-        except httpx.RequestError as e:
-            logger.exception(f"🔌 Connection error writing to Google Sheets: {e}")
-            raise HTTPException(status_code=500, detail=f"Network error: {e}")
-        except Exception as exc:
-            logger.exception("💥 Unexpected error writing to Google Sheet")
-            raise HTTPException(status_code=500, detail=f"Internal error: {exc}")
+    except HTTPException:
+        raise
+    except httpx.RequestError as e:
+        logger.exception("🔌 Connection error writing to Google Sheets: %s", e)
+        raise HTTPException(status_code=500, detail=f"Network error: {e}")
+    except Exception as exc:
+        logger.exception("💥 Unexpected error batch-writing to Google Sheet")
+        raise HTTPException(status_code=500, detail=f"Internal error: {exc}")
 
 
 
@@ -132,18 +185,18 @@ async def write_to_google_sheet(sheet_id: str, range_: str, values: List[List[st
 # 📡 FastAPI Endpoints
 
 @app.post("/create_sheet")
-async def create_sheet_endpoint(request: Request) -> JSONResponse:
-    data = await request.json()
+async def create_sheet_endpoint(request: Request) -> ORJSONResponse:
+    data = orjson.loads(await request.body())
     title = data.get("title")
     if not title:
         raise HTTPException(status_code=400, detail="Missing 'title'")
     result = await create_google_sheet(title)
-    return JSONResponse({"ok": True, "sheetId": result["spreadsheetId"], "link": result["spreadsheetUrl"]})
+    return ORJSONResponse({"ok": True, "sheetId": result["spreadsheetId"], "link": result["spreadsheetUrl"]})
 
 
 @app.post("/write_data")
-async def write_data_endpoint(request: Request) -> JSONResponse:
-    data = await request.json()
+async def write_data_endpoint(request: Request) -> ORJSONResponse:
+    data = orjson.loads(await request.body())
     sheet_id = data.get("sheetId")
     range_ = data.get("range")
     values = data.get("values")
@@ -152,7 +205,23 @@ async def write_data_endpoint(request: Request) -> JSONResponse:
         raise HTTPException(status_code=400, detail="Missing one or more required fields")
 
     result = await write_to_google_sheet(sheet_id, range_, values)
-    return JSONResponse({"ok": True, "updatedRange": result.get("updatedRange", "")})
+    return ORJSONResponse({"ok": True, "updatedRange": result.get("updatedRange", "")})
+
+
+@app.post("/batch_write")
+async def batch_write_endpoint(request: Request) -> ORJSONResponse:
+    data = orjson.loads(await request.body())
+    sheet_id = data.get("sheetId")
+    updates = data.get("updates")
+
+    if not sheet_id or not updates:
+        raise HTTPException(status_code=400, detail="Missing 'sheetId' or 'updates'")
+    if not all(isinstance(u, dict) and u.get("range") and u.get("values") for u in updates):
+        raise HTTPException(status_code=400, detail="Each update needs 'range' and 'values'")
+
+    result = await batch_write_to_google_sheet(sheet_id, updates)
+    updated_ranges = [r.get("updatedRange", "") for r in result.get("responses", [])]
+    return ORJSONResponse({"ok": True, "updatedRanges": updated_ranges})
 
 
 @app.get("/health")
@@ -161,6 +230,15 @@ async def health() -> Dict[str, str]:
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
 
-    uvicorn.run("mcp_server_gsheet:app", host="127.0.0.1", port=8083, log_level="info")
+    # uvloop has no Windows build; fall back to the stdlib loop there.
+    uvicorn.run(
+        "mcp_server_gsheet:app",
+        host="127.0.0.1",
+        port=8083,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        log_level="info",
+    )
@@ -1,14 +1,17 @@
 
 import asyncio
-import json
 import logging
 import os
 from contextlib import suppress
 from typing import Any, Dict, Set
-import subprocess
+
+import orjson
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from core.config import load_yaml
+from core.session import MultiMCP
 
 
 load_dotenv()
@@ -17,14 +20,23 @@ load_dotenv()
 logger = logging.getLogger("telegram_sse_server")
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Telegram SSE Bridge")
+app = FastAPI(title="Telegram SSE Bridge", default_response_class=ORJSONResponse)
 
 # Global state for broadcasting messages to connected SSE clients.
-app.state.event_queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue()
-app.state.clients: Set[asyncio.Queue[Dict[str, Any]]] = set()
+# Messages are queued as fully encoded SSE frames so every client shares one bytes object.
+app.state.event_queue: asyncio.Queue[bytes] = asyncio.Queue()
+app.state.clients: Set[asyncio.Queue[bytes]] = set()
 app.state.clients_lock = asyncio.Lock()
+# Frames put on event_queue but not yet handed to clients; guarded by clients_lock.
+app.state.pending_frames = 0
 app.state.latest_message: Dict[str, Any] | None = None
 app.state.broadcast_task: asyncio.Task | None = None
+# One MultiMCP shared by every agent run so MCP sessions stay warm between messages.
+app.state.multi_mcp: MultiMCP | None = None
+app.state.connect_task: asyncio.Task | None = None
+app.state.agent_tasks: Set[asyncio.Task] = set()
+
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "profiles.yaml")
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TELEGRAM_BOT_TOKEN:
@@ -33,24 +45,74 @@ if not TELEGRAM_BOT_TOKEN:
     )
 
 
+def encode_sse_frame(message: Dict[str, Any]) -> bytes:
+    """Serialize a message into a complete SSE `data:` frame."""
+    return b"data: " + orjson.dumps({"query": message["text"]}) + b"\n\n"
+
+
+def offer_frame(client_queue: asyncio.Queue[bytes], payload: bytes) -> None:
+    """Enqueue a frame without blocking, dropping the client's oldest frame if it is full."""
+    try:
+        client_queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        client_queue.get_nowait()
+        client_queue.put_nowait(payload)
+        logger.warning("SSE client queue full; dropped oldest message.")
+
+
 async def broadcast_loop() -> None:
-    """Read messages from the central queue and fan them out to all clients."""
+    """Read frames from the central queue and fan them out to all clients."""
     while True:
-        message = await app.state.event_queue.get()
+        payload = await app.state.event_queue.get()
         async with app.state.clients_lock:
             if not app.state.clients:
                 logger.debug("No SSE clients connected; message queued but not delivered.")
             # Iterate over a copy to avoid set size changes during iteration.
             for client_queue in list(app.state.clients):
-                # Only block the broadcaster if the client queue is full.
-                await client_queue.put(message)
+                # Never block the broadcaster on a slow client.
+                offer_frame(client_queue, payload)
+            app.state.pending_frames -= 1
         app.state.event_queue.task_done()
 
 
+async def _run_agent(user_input: str, multi_mcp: MultiMCP) -> None:
+    """Run one agent session for a Telegram message on the shared MCP dispatcher."""
+    try:
+        # Imported lazily: the decision/perception modules build a model client at
+        # import time, which must not stop the bridge from starting and buffering events.
+        from core.loop import AgentLoop
+
+        agent = AgentLoop(user_input=user_input, dispatcher=multi_mcp)
+        final_response = await agent.run()
+        logger.info("💡 Final Answer: %s", final_response.replace("FINAL_ANSWER:", "").strip())
+    except Exception:
+        logger.exception("Agent run failed for message: %s", user_input)
+
+
+async def _connect_dispatcher() -> None:
+    """Start the shared MCP servers; agent runs are enabled once this finishes."""
+    profile = load_yaml(PROFILE_PATH)
+    multi_mcp = MultiMCP(server_configs=profile.get("mcp_servers", []))
+    try:
+        await multi_mcp.connect()
+    except asyncio.CancelledError:
+        await multi_mcp.disconnect()
+        raise
+    except Exception:
+        logger.exception("MCP dispatcher failed to start; agent runs are disabled.")
+        await multi_mcp.disconnect()
+        return
+    app.state.multi_mcp = multi_mcp
+    logger.info("MCP dispatcher ready with %d tools.", len(multi_mcp.tool_map))
+
+
 @app.on_event("startup")
 async def startup_event() -> None:
     logger.info("Starting Telegram SSE bridge server.")
     app.state.broadcast_task = asyncio.create_task(broadcast_loop())
+    # Connect in the background so a slow or broken MCP server can't keep the
+    # webhook and SSE endpoints from coming up.
+    app.state.connect_task = asyncio.create_task(_connect_dispatcher())
 
 
 @app.on_event("shutdown")
@@ -62,6 +124,21 @@ async def shutdown_event() -> None:
         with suppress(asyncio.CancelledError):
             await broadcast_task
 
+    connect_task: asyncio.Task | None = app.state.connect_task
+    if connect_task is not None and not connect_task.done():
+        connect_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await connect_task
+
+    for task in list(app.state.agent_tasks):
+        task.cancel()
+    if app.state.agent_tasks:
+        await asyncio.gather(*app.state.agent_tasks, return_exceptions=True)
+
+    multi_mcp: MultiMCP | None = app.state.multi_mcp
+    if multi_mcp is not None:
+        await multi_mcp.disconnect()
+
 
 def extract_text_message(update: Dict[str, Any]) -> Dict[str, Any] | None:
     """Extract sender and text content from a Telegram update payload."""
@@ -81,10 +158,10 @@ def extract_text_message(update: Dict[str, Any]) -> Dict[str, Any] | None:
 
 
 @app.post("/webhook")
-async def telegram_webhook(request: Request) -> JSONResponse:
+async def telegram_webhook(request: Request) -> ORJSONResponse:
     try:
-        update = await request.json()
-    except json.JSONDecodeError as exc:
+        update = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as exc:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid JSON payload.",
@@ -94,26 +171,38 @@ async def telegram_webhook(request: Request) -> JSONResponse:
     extracted = extract_text_message(update)
     if extracted is None:
         logger.info("Received Telegram update without text message; ignoring.")
-        return JSONResponse({"ok": True, "ignored": True})
+        return ORJSONResponse({"ok": True, "ignored": True})
 
     app.state.latest_message = extracted
-    await app.state.event_queue.put(extracted)
-
-    try:
-        subprocess.Popen(
-        ["uv", "run", "agent.py"],  # run agent.py in a new process
-        cwd=os.path.dirname(__file__),  # run from current folder
-        )
-        logger.info("🚀 Triggered agent.py subprocess.")
-    except Exception as e:
-        logger.error(f"Failed to start agent.py: {e}")
+    payload = encode_sse_frame(extracted)
+    async with app.state.clients_lock:
+        # Usually the only consumer is a single agent; hand it the frame directly
+        # and only go through the broadcaster once a second client is connected.
+        # Frames still pending from a fan-out period must be delivered first, so the
+        # direct path is only taken once the broadcaster has fully drained.
+        if len(app.state.clients) > 1 or app.state.pending_frames:
+            app.state.pending_frames += 1
+            app.state.event_queue.put_nowait(payload)  # unbounded; never blocks
+        elif app.state.clients:
+            offer_frame(next(iter(app.state.clients)), payload)
+        else:
+            logger.debug("No SSE clients connected; message not delivered.")
+
+    if app.state.multi_mcp is None:
+        logger.error("MCP dispatcher not ready; agent not started.")
+    else:
+        task = asyncio.create_task(_run_agent(extracted["text"], app.state.multi_mcp))
+        # Keep a strong reference until the run finishes so the task isn't garbage-collected.
+        app.state.agent_tasks.add(task)
+        task.add_done_callback(app.state.agent_tasks.discard)
+        logger.info("🚀 Started agent run.")
     logger.info("Queued message from %s: %s", extracted["sender"], extracted["text"])
-    return JSONResponse({"ok": True})
+    return ORJSONResponse({"ok": True})
 
 
 @app.get("/events")
 async def sse_events() -> StreamingResponse:
-    client_queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=10)
+    client_queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=10)
 
     async with app.state.clients_lock:
         app.state.clients.add(client_queue)
@@ -122,9 +211,7 @@ async def sse_events() -> StreamingResponse:
     async def event_generator() -> Any:
         try:
             while True:
-                message = await client_queue.get()
-                payload = json.dumps({"query": message["text"]})
-                yield f"data: {payload}\n\n"
+                yield await client_queue.get()
         except asyncio.CancelledError:
             raise
         finally:
@@ -136,23 +223,32 @@ async def sse_events() -> StreamingResponse:
                 )
 
     headers = {
+        "Content-Type": "text/event-stream",
         "Cache-Control": "no-cache",
         "Connection": "keep-alive",
     }
+    # Frames are already encoded, so bypass media_type handling and send the bytes as-is.
     return StreamingResponse(
         event_generator(),
-        media_type="text/event-stream",
+        media_type=None,
         headers=headers,
     )
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
 
+    # uvloop has no Windows build; fall back to the stdlib loop there.
+    # Single worker on purpose: SSE clients, the latest message and the warm MCP
+    # sessions all live in this process, and extra workers would each get their own.
     uvicorn.run(
         "mcp_server_telegram_sse:app",
         host="127.0.0.1",
         port=8081,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info",
         reload=False,
+        workers=1,
     )
@@ -40,6 +40,8 @@ Respond in **exactly one line** using one of the following formats:
 - FUNCTION_CALL: tool_name|param1=value1|param2=value2
 - FINAL_ANSWER: [your final result] *(Not description, but actual final answer)
 
+Only exception: if several tool calls are fully independent (none needs another's result), you may output them as consecutive FUNCTION_CALL lines, one per line.
+
 🧠 Context:
 - Step: {step_num} of {max_steps}
 - Memory: 
@@ -85,9 +87,19 @@ Respond in **exactly one line** using one of the following formats:
         raw = (await model.generate_text(prompt)).strip()
         log("plan", f"LLM output: {raw}")
 
+        calls = []
         for line in raw.splitlines():
-            if line.strip().startswith("FUNCTION_CALL:") or line.strip().startswith("FINAL_ANSWER:"):
-                return line.strip()
+            line = line.strip()
+            if line.startswith("FUNCTION_CALL:"):
+                calls.append(line)
+                continue
+            if calls:
+                break
+            if line.startswith("FINAL_ANSWER:"):
+                return line
+
+        if calls:
+            return "\n".join(calls)
 
         return "FINAL_ANSWER: [unknown]"
 
@@ -24,10 +24,13 @@
 from typing import List, Optional, Literal
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 import requests
 import numpy as np
 import faiss
 
+EMBEDDING_TIMEOUT = 30  # seconds
+
 
 class MemoryItem(BaseModel):
     text: str
@@ -50,7 +53,8 @@ class MemoryManager:
     def _get_embedding(self, text: str) -> np.ndarray:
         response = requests.post(
             self.embedding_model_url,
-            json={"model": self.model_name, "prompt": text}
+            json={"model": self.model_name, "prompt": text},
+            timeout=EMBEDDING_TIMEOUT,
         )
         response.raise_for_status()
         return np.array(response.json()["embedding"], dtype=np.float32)
@@ -98,6 +102,13 @@ class MemoryManager:
 
         return results
 
+    # Async variants: the embedding request is blocking, so run it off the event loop.
+    async def add_async(self, item: MemoryItem):
+        await asyncio.to_thread(self.add, item)
+
+    async def retrieve_async(self, query: str, **kwargs) -> List[MemoryItem]:
+        return await asyncio.to_thread(self.retrieve, query, **kwargs)
+
     def bulk_add(self, items: List[MemoryItem]):
         for item in items:
             self.add(item)
@@ -1,8 +1,9 @@
+import asyncio
 import os
 import json
-import yaml
 import requests
 from pathlib import Path
+from core.config import load_yaml
 from google import genai
 from dotenv import load_dotenv
 
@@ -11,11 +12,12 @@ load_dotenv()
 ROOT = Path(__file__).parent.parent
 MODELS_JSON = ROOT / "config" / "models.json"
 PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+OLLAMA_TIMEOUT = 120  # seconds; local generation can be slow but must not hang forever
 
 class ModelManager:
     def __init__(self):
         self.config = json.loads(MODELS_JSON.read_text())
-        self.profile = yaml.safe_load(PROFILE_YAML.read_text())
+        self.profile = load_yaml(PROFILE_YAML)
 
         self.text_model_key = self.profile["llm"]["text_generation"]
         self.model_info = self.config["models"][self.text_model_key]
@@ -27,11 +29,13 @@ class ModelManager:
             self.client = genai.Client(api_key=api_key)
 
     async def generate_text(self, prompt: str) -> str:
+        # Both backends are blocking HTTP clients; run them in a worker thread so the
+        # event loop (and anything else sharing it, e.g. the SSE bridge) keeps running.
         if self.model_type == "gemini":
-            return self._gemini_generate(prompt)
+            return await asyncio.to_thread(self._gemini_generate, prompt)
 
         elif self.model_type == "ollama":
-            return self._ollama_generate(prompt)
+            return await asyncio.to_thread(self._ollama_generate, prompt)
 
         raise NotImplementedError(f"Unsupported model type: {self.model_type}")
 
@@ -53,7 +57,8 @@ class ModelManager:
     def _ollama_generate(self, prompt: str) -> str:
         response = requests.post(
             self.model_info["url"]["generate"],
-            json={"model": self.model_info["model"], "prompt": prompt, "stream": False}
+            json={"model": self.model_info["model"], "prompt": prompt, "stream": False},
+            timeout=OLLAMA_TIMEOUT,
         )
         response.raise_for_status()
         return response.json()["response"].strip()